@@ -14,100 +14,198 @@ Expected columns (case-sensitive):
 from __future__ import annotations
 
 import argparse
-import sys
+import io
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
+from pnz_common import (
+    BALANCE_COLS,
+    LARGE_CSV_BYTES,
+    STREAM_CHUNK_ROWS,
+    cached_read_csv,
+    csv_header,
+    infer_customer_name,
+    infer_customer_name_arrow,
+    parse_inv_date,
+    select_input_file,
+)
 
-def select_input_file() -> Optional[Path]:
-    """Offer an interactive selection of recent CSV files in the current directory."""
-    csv_files = sorted(Path(".").glob("*.csv"), key=lambda p: p.stat().st_mtime, reverse=True)
-    if not csv_files:
-        print("No CSV files found in the current directory.", file=sys.stderr)
-        return None
-
-    print("Select a CSV file:")
-    for idx, path in enumerate(csv_files, start=1):
-        mtime = datetime.fromtimestamp(path.stat().st_mtime).strftime("%Y-%m-%d %H:%M")
-        print(f"  {idx}) {path.name} (modified {mtime})")
-    print("  0) Enter a custom path")
-
-    try:
-        choice_raw = input("Enter choice: ")
-    except EOFError:
-        print("No input received; provide --input to skip interactive mode.", file=sys.stderr)
-        return None
-
-    try:
-        choice = int(choice_raw.strip())
-    except ValueError:
-        print("Invalid selection.", file=sys.stderr)
-        return None
-
-    if choice == 0:
-        custom = input("Enter path to CSV: ").strip()
-        return Path(custom) if custom else None
-    if 1 <= choice <= len(csv_files):
-        return csv_files[choice - 1]
-
-    print("Selection out of range.", file=sys.stderr)
-    return None
-
-
-def infer_customer_name(df: pd.DataFrame) -> Optional[str]:
-    """Try to infer the customer name from common columns."""
-    candidate_columns = ["Billing Name", "Customer Name", "Customer"]
-    for col in candidate_columns:
-        if col not in df.columns:
-            continue
-        series = df[col].dropna()
-        if series.empty:
-            continue
-        if not pd.api.types.is_string_dtype(series):
-            continue
-        values = series.astype(str).str.strip()
-        values = values[values != ""]
-        uniques = values.unique()
-        if len(uniques) == 1:
-            return uniques[0]
-    return None
-
-
-def build_balance_report(df: pd.DataFrame, customer: str, as_of: datetime) -> str:
-    df = df.copy()
-    df["Inv Date"] = pd.to_datetime(df.get("Inv Date"), errors="coerce")
-
-    payable = df[df["Balance"] > 0].copy()
-    balance_total = float(payable["Balance"].sum())
-    order_count = payable["Order No"].nunique() if "Order No" in payable.columns else int(payable.shape[0])
-
-    min_date = payable["Inv Date"].min() if "Inv Date" in payable.columns else None
-    max_date = payable["Inv Date"].max() if "Inv Date" in payable.columns else None
-
-    lines = []
-    lines.append(f"Balance Summary — {customer} (as of {as_of:%d-%b-%Y})")
-    lines.append("")
-    lines.append(f"1) Total balance payable as of today: Rs {int(balance_total):,}")
-    lines.append("")
-    lines.append(f"2) Total number of orders with balance payable: {order_count}")
-    lines.append("")
+
+def _arrow_aggregates(table: pa.Table) -> dict:
+    """Compute the balance aggregates directly on the Arrow table.
+
+    Every reduction this report needs is a single columnar pass, so there is
+    no reason to build a DataFrame at all — each value comes straight out of
+    an Arrow C++ kernel.
+    """
+    bal = table["Balance"]
+    mask = pc.fill_null(pc.greater(bal, 0), False)
+
+    total = pc.sum(pc.filter(bal, mask)).as_py()
+    balance_total = float(total) if total is not None else 0.0
+
+    if "Order No" in table.column_names:
+        orders = pc.filter(table["Order No"], mask)
+        order_count = pc.count_distinct(orders, mode="only_valid").as_py()
+    else:
+        order_count = pc.sum(mask).as_py() or 0
+
+    min_date = max_date = None
+    if "Inv Date" in table.column_names:
+        dates = table["Inv Date"]
+        if pa.types.is_timestamp(dates.type):
+            bounds = pc.min_max(pc.filter(dates, mask))
+            min_date = bounds["min"].as_py()
+            max_date = bounds["max"].as_py()
+        else:
+            # Non-ISO exports keep Inv Date as text; parse with the format
+            # fast paths and reduce over the masked NumPy view.
+            parsed = parse_inv_date(dates.to_pandas())
+            payable_dates = parsed.to_numpy(dtype="datetime64[ns]")[mask.to_numpy()]
+            valid = payable_dates[~np.isnat(payable_dates)]
+            if valid.size:
+                min_date = pd.Timestamp(valid.min())
+                max_date = pd.Timestamp(valid.max())
+
+    return {
+        "balance_total": balance_total,
+        "order_count": int(order_count),
+        "min_date": min_date,
+        "max_date": max_date,
+    }
+
+
+def build_balance_report(
+    df: pd.DataFrame, customer: str, as_of: datetime, as_of_str: Optional[str] = None
+) -> str:
+    # Dates arrive pre-parsed from the Arrow CSV schema; only coerce (into a
+    # local, never mutating df) when handed an untyped column, e.g. from Excel.
+    dates = df.get("Inv Date")
+    if dates is not None and not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = parse_inv_date(dates)
+
+    # One boolean mask over the raw arrays, reused for every reduction — no
+    # filtered-frame copy and each column is read once.
+    bal = df["Balance"].to_numpy(dtype=np.float64, na_value=np.nan)
+    mask = bal > 0
+    balance_total = float(bal[mask].sum())
+
+    if "Order No" in df.columns:
+        # Order IDs are Arrow-backed strings, so unique() runs as an Arrow
+        # kernel with no Python object boxing. NaNs survive unique(), so
+        # discount them to keep nunique's dropna semantics.
+        uniques = df["Order No"][mask].unique()
+        order_count = int(len(uniques) - pd.isna(uniques).sum())
+    else:
+        order_count = int(mask.sum())
+
+    if dates is not None:
+        payable_dates = dates.to_numpy(dtype="datetime64[ns]")[mask]
+        valid = payable_dates[~np.isnat(payable_dates)]
+        min_date = pd.Timestamp(valid.min()) if valid.size else pd.NaT
+        max_date = pd.Timestamp(valid.max()) if valid.size else pd.NaT
+    else:
+        min_date = max_date = None
+
+    return _render_balance_report(
+        customer, as_of, balance_total, order_count, min_date, max_date, as_of_str
+    )
+
+
+def _render_balance_report(
+    customer: str,
+    as_of: datetime,
+    balance_total: float,
+    order_count: int,
+    min_date,
+    max_date,
+    as_of_str: Optional[str] = None,
+) -> str:
+    """Render the report text from precomputed aggregates.
+
+    as_of_str lets callers reuse an already-formatted date (it also names the
+    output file) instead of re-running strftime.
+    """
+    if as_of_str is None:
+        as_of_str = as_of.strftime("%d-%b-%Y")
+    # Write straight into one growable buffer instead of collecting a list of
+    # line strings and joining them at the end.
+    buf = io.StringIO()
+    w = buf.write
+    w(f"Balance Summary — {customer} (as of {as_of_str})\n")
+    w("\n")
+    w(f"1) Total balance payable as of today: Rs {int(balance_total):,}\n")
+    w("\n")
+    w(f"2) Total number of orders with balance payable: {order_count}\n")
+    w("\n")
+    w("3) Unpaid invoice date range\n")
     if pd.notna(min_date) or pd.notna(max_date):
         min_str = min_date.strftime("%d-%b-%Y") if pd.notna(min_date) else "N/A"
         max_str = max_date.strftime("%d-%b-%Y") if pd.notna(max_date) else "N/A"
-        lines.append("3) Unpaid invoice date range")
-        lines.append(f"   From {min_str} to {max_str}")
+        w(f"   From {min_str} to {max_str}\n")
     else:
-        lines.append("3) Unpaid invoice date range")
-        lines.append("   No unpaid invoices found.")
+        w("   No unpaid invoices found.\n")
+    w("\n")
+    w("Notes\n")
+    w(" - Only invoices with Balance > 0 are counted.\n")
+
+    return buf.getvalue()
+
+
+def _stream_aggregates(path: Path) -> dict:
+    """Chunked aggregation for CSVs too large to materialize whole.
+
+    Applies the same masked reductions as build_balance_report per chunk and
+    merges the running totals, so peak memory stays O(chunk size). Returns the
+    _render_balance_report arguments plus the customer name inferred from the
+    first chunk (key "inferred").
+    """
+    wanted = set(BALANCE_COLS)
+    has_orders = "Order No" in csv_header(path)
+    balance_total = 0.0
+    orders: set = set()
+    fallback_count = 0
+    min_date = max_date = None
+    inferred: Optional[str] = None
+
+    reader = pd.read_csv(path, chunksize=STREAM_CHUNK_ROWS, usecols=lambda c: c in wanted)
+    for chunk in reader:
+        if inferred is None:
+            inferred = infer_customer_name(chunk)
 
-    lines.append("")
-    lines.append("Notes")
-    lines.append(" - Only invoices with Balance > 0 are counted.")
+        bal = chunk["Balance"].to_numpy(dtype=np.float64, na_value=np.nan)
+        mask = bal > 0
+        balance_total += float(bal[mask].sum())
 
-    return "\n".join(lines)
+        if has_orders:
+            uniques = chunk["Order No"][mask].unique()
+            orders.update(v for v in uniques if not pd.isna(v))
+        else:
+            fallback_count += int(mask.sum())
+
+        if "Inv Date" in chunk.columns:
+            dates = parse_inv_date(chunk["Inv Date"])
+            payable_dates = dates.to_numpy(dtype="datetime64[ns]")[mask]
+            valid = payable_dates[~np.isnat(payable_dates)]
+            if valid.size:
+                chunk_min = pd.Timestamp(valid.min())
+                chunk_max = pd.Timestamp(valid.max())
+                min_date = chunk_min if min_date is None else min(min_date, chunk_min)
+                max_date = chunk_max if max_date is None else max(max_date, chunk_max)
+
+    return {
+        "balance_total": balance_total,
+        "order_count": len(orders) if has_orders else fallback_count,
+        "min_date": min_date,
+        "max_date": max_date,
+        "inferred": inferred,
+    }
 
 
 def main() -> None:
@@ -142,25 +240,37 @@ def main() -> None:
         parser.error(f"Input file not found: {input_path}")
 
     as_of = datetime.strptime(args.as_of, "%Y-%m-%d")
-
-    df = pd.read_csv(input_path)
-    if "Balance" not in df.columns:
-        raise ValueError("Input missing required column: Balance")
-
+    as_of_str = as_of.strftime("%d-%b-%Y")
     customer = args.customer
-    if customer == "Customer":
-        inferred = infer_customer_name(df)
-        if inferred:
-            customer = inferred
 
-    report_text = build_balance_report(df, customer, as_of)
+    if input_path.stat().st_size >= LARGE_CSV_BYTES:
+        if "Balance" not in csv_header(input_path):
+            raise ValueError("Input missing required column: Balance")
+        aggregates = _stream_aggregates(input_path)
+        inferred = aggregates.pop("inferred")
+        if customer == "Customer" and inferred:
+            customer = inferred
+        report_text = _render_balance_report(customer, as_of, as_of_str=as_of_str, **aggregates)
+    else:
+        table = cached_read_csv(input_path, BALANCE_COLS)
+        if "Balance" not in table.column_names:
+            raise ValueError("Input missing required column: Balance")
+        if customer == "Customer":
+            inferred = infer_customer_name_arrow(table)
+            if inferred:
+                customer = inferred
+        report_text = _render_balance_report(
+            customer, as_of, as_of_str=as_of_str, **_arrow_aggregates(table)
+        )
 
     output_path = (
         Path(args.output)
         if args.output
-        else input_path.with_name(f"Balance Summary - {customer} (as of {as_of:%d-%b-%Y}).txt")
+        else input_path.with_name(f"Balance Summary - {customer} (as of {as_of_str}).txt")
     )
-    output_path.write_text(report_text)
+    # Encode once ourselves: write_text re-encodes through a TextIOWrapper
+    # (and would pick a platform-dependent default encoding).
+    output_path.write_bytes(report_text.encode("utf-8"))
     print(f"Wrote balance report: {output_path}")
 
 
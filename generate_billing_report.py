@@ -21,130 +21,312 @@ Outputs a txt report next to the input file. You can override the output path.
 from __future__ import annotations
 
 import argparse
-import sys
+import io
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 import pandas as pd
+from numba import njit, types
 
+from pnz_common import (
+    BILLING_COLS,
+    LARGE_CSV_BYTES,
+    STREAM_CHUNK_ROWS,
+    cached_read_csv,
+    csv_header,
+    infer_customer_name,
+    parse_inv_date,
+    select_input_file,
+    to_dataframe,
+)
 
-def fy_label(date: pd.Timestamp) -> Optional[str]:
-    if pd.isna(date):
-        return None
-    start = date.year if date.month >= 4 else date.year - 1
-    return f"FY{start}-{(start + 1) % 100:02d}"
+REQUIRED_COLUMNS = {"Inv Date", "Inv Value", "Balance", "Order No", "Inv No"}
 
 
-def build_report(df: pd.DataFrame, customer: str, as_of: datetime) -> str:
-    df = df.copy()
-    df["Inv Date"] = pd.to_datetime(df["Inv Date"], errors="coerce")
-    df["FY"] = df["Inv Date"].apply(fy_label)
-    df["CY"] = df["Inv Date"].dt.year
+def read_csv_fast(path: Path) -> pd.DataFrame:
+    """Load only the billing-report columns via the shared Arrow reader (Parquet-cached)."""
+    return to_dataframe(cached_read_csv(path, BILLING_COLS))
 
-    first_invoice = df["Inv Date"].min()
-    lifetime_billing = int(df["Inv Value"].sum())
-    outstanding_balance = int(df["Balance"].sum())
-    order_count = df["Order No"].nunique()
 
-    fy_breakdown = (
-        df.dropna(subset=["FY"])
-        .groupby("FY")
-        .agg(total_value=("Inv Value", "sum"), invoice_count=("Inv No", "size"))
-        .reset_index()
+def fy_label_from_start(start_year: int) -> str:
+    """Format an April–March financial-year label, e.g. 2025 -> "FY2025-26"."""
+    return f"FY{start_year}-{(start_year + 1) % 100:02d}"
+
+
+# Sentinel for "no dated invoice seen" inside the kernel; NaT views as int64 min.
+_DATE_MAX = np.iinfo(np.int64).max
+_DATE_NAT = np.iinfo(np.int64).min
+
+
+# Eager signature: compile at import time so the first report pays no JIT cost.
+# The input arrays are declared readonly because pandas hands out immutable views.
+def _ro(dtype):
+    return types.Array(dtype, 1, "C", readonly=True)
+
+
+_AGGREGATE_SIG = types.Tuple(
+    (
+        types.float64[:],
+        types.int64[:],
+        types.int64,
+        types.float64,
+        types.int64,
+        types.float64,
+        types.int64,
+        types.float64,
+        types.float64,
+        types.int64,
+    )
+)(_ro(types.int16), _ro(types.int32), _ro(types.float64), _ro(types.float64), _ro(types.int64), types.int64)
+
+
+@njit(_AGGREGATE_SIG, cache=True)
+def _aggregate(months, years, values, balances, dates_ns, current_year):
+    """Single-pass FY/CY/lifetime/balance aggregation over column arrays.
+
+    Missing dates are encoded as month/year == -1 and dates_ns == int64 min (NaT);
+    missing amounts are NaN and are skipped, matching pandas' sum semantics.
+    Returns FY totals/counts as parallel arrays indexed from min_fy.
+    """
+    n = values.size
+    min_fy = np.int64(2**62)
+    max_fy = np.int64(-(2**62))
+    for i in range(n):
+        y = years[i]
+        if y >= 0:
+            fy = y if months[i] >= 4 else y - 1
+            if fy < min_fy:
+                min_fy = fy
+            if fy > max_fy:
+                max_fy = fy
+    if max_fy < min_fy:
+        min_fy = np.int64(0)
+        max_fy = np.int64(-1)
+
+    fy_totals = np.zeros(max_fy - min_fy + 1, np.float64)
+    fy_counts = np.zeros(max_fy - min_fy + 1, np.int64)
+    cy_value = 0.0
+    cy_count = np.int64(0)
+    undated_value = 0.0
+    undated_count = np.int64(0)
+    lifetime = 0.0
+    balance_total = 0.0
+    first_date = _DATE_MAX
+
+    for i in range(n):
+        v = values[i]
+        has_value = not np.isnan(v)
+        if has_value:
+            lifetime += v
+        b = balances[i]
+        if not np.isnan(b):
+            balance_total += b
+
+        y = years[i]
+        if y < 0:
+            if has_value:
+                undated_value += v
+            undated_count += 1
+            continue
+
+        fy = y if months[i] >= 4 else y - 1
+        idx = fy - min_fy
+        if has_value:
+            fy_totals[idx] += v
+        fy_counts[idx] += 1
+        if y == current_year:
+            if has_value:
+                cy_value += v
+            cy_count += 1
+        d = dates_ns[i]
+        if d != _DATE_NAT and d < first_date:
+            first_date = d
+
+    return (
+        fy_totals,
+        fy_counts,
+        min_fy,
+        cy_value,
+        cy_count,
+        undated_value,
+        undated_count,
+        lifetime,
+        balance_total,
+        first_date,
     )
-    fy_breakdown["start_year"] = fy_breakdown["FY"].str.extract(r"FY(\d{4})")[0].astype(int)
-    fy_breakdown = fy_breakdown.sort_values("start_year")
 
+
+def _column_arrays(df: pd.DataFrame):
+    """Pull the kernel's input arrays out of the frame.
+
+    Dates arrive pre-parsed from the Arrow CSV schema; only coerce (into a
+    local, never mutating df) when handed an untyped column, e.g. from Excel.
+    """
+    dates = df["Inv Date"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = parse_inv_date(dates)
+    months = dates.dt.month.to_numpy(dtype=np.int16, na_value=-1)
+    years = dates.dt.year.to_numpy(dtype=np.int32, na_value=-1)
+    values = df["Inv Value"].to_numpy(dtype=np.float64, na_value=np.nan)
+    balances = df["Balance"].to_numpy(dtype=np.float64, na_value=np.nan)
+    dates_ns = dates.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return months, years, values, balances, dates_ns
+
+
+def _render_report(
+    customer: str,
+    as_of: datetime,
+    *,
+    as_of_str: Optional[str] = None,
+    first_invoice,
+    lifetime_billing: int,
+    fy_rows: list[tuple[int, int, int]],
+    undated_value: int,
+    undated_count: int,
+    cy_value: int,
+    cy_count: int,
+    outstanding_balance: int,
+    order_count: int,
+) -> str:
+    """Render the report text from precomputed aggregates.
+
+    fy_rows holds (fy_start_year, total_value, invoice_count) sorted by year.
+    as_of_str lets callers reuse an already-formatted date (it also names the
+    output file) instead of re-running strftime.
+    """
     current_year = as_of.year
-    cy_current = df[df["CY"] == current_year]
-    cy_value = int(cy_current["Inv Value"].sum()) if not cy_current.empty else 0
-    cy_count = int(cy_current.shape[0]) if not cy_current.empty else 0
-
-    undated = df[df["FY"].isna()]
-    undated_value = int(undated["Inv Value"].sum())
-    undated_count = int(undated.shape[0])
-
-    lines = []
-    lines.append(f"Customer Billing Summary — {customer} (as of {as_of:%d-%b-%Y})")
-    lines.append("")
-    lines.append("1) Lifetime billing")
-    lines.append(f"   Total invoiced: Rs {lifetime_billing:,}")
+    if as_of_str is None:
+        as_of_str = as_of.strftime("%d-%b-%Y")
+
+    # Write straight into one growable buffer instead of collecting a list of
+    # line strings and joining them at the end.
+    buf = io.StringIO()
+    w = buf.write
+    w(f"Customer Billing Summary — {customer} (as of {as_of_str})\n")
+    w("\n")
+    w("1) Lifetime billing\n")
+    w(f"   Total invoiced: Rs {lifetime_billing:,}\n")
     if pd.notna(first_invoice):
-        lines.append(f"   First invoice date: {first_invoice:%d-%b-%Y}")
-    lines.append("")
-    lines.append("2) Billing by financial year (April–March)")
-    for _, row in fy_breakdown.iterrows():
-        lines.append(
-            f"   {row['FY']}: Rs {int(row['total_value']):,} across {row['invoice_count']} invoice(s)"
-        )
+        w(f"   First invoice date: {first_invoice:%d-%b-%Y}\n")
+    w("\n")
+    w("2) Billing by financial year (April–March)\n")
+    for start_year, total_value, invoice_count in fy_rows:
+        w(f"   {fy_label_from_start(start_year)}: Rs {total_value:,} across {invoice_count} invoice(s)\n")
     if undated_count:
-        lines.append(f"   Not dated: Rs {undated_value:,} across {undated_count} entry")
-    lines.append("")
-    lines.append(f"3) Billing for current calendar year (Jan–Dec {current_year})")
-    lines.append(f"   {current_year}: Rs {cy_value:,} across {cy_count} invoice(s)")
-    lines.append("")
-    lines.append("4) Current outstanding balance")
-    lines.append(f"   Rs {outstanding_balance:,}")
-    lines.append("")
-    lines.append("5) Total number of rented orders")
-    lines.append(f"   {order_count}")
-
-    return "\n".join(lines)
-
-
-def select_input_file() -> Optional[Path]:
-    """Offer an interactive selection of recent CSV files in the current directory."""
-    csv_files = sorted(Path(".").glob("*.csv"), key=lambda p: p.stat().st_mtime, reverse=True)
-    if not csv_files:
-        print("No CSV files found in the current directory.", file=sys.stderr)
-        return None
-
-    print("Select a CSV file:")
-    for idx, path in enumerate(csv_files, start=1):
-        mtime = datetime.fromtimestamp(path.stat().st_mtime).strftime("%Y-%m-%d %H:%M")
-        print(f"  {idx}) {path.name} (modified {mtime})")
-    print("  0) Enter a custom path")
-
-    try:
-        choice_raw = input("Enter choice: ")
-    except EOFError:
-        print("No input received; provide --input to skip interactive mode.", file=sys.stderr)
-        return None
-
-    try:
-        choice = int(choice_raw.strip())
-    except ValueError:
-        print("Invalid selection.", file=sys.stderr)
-        return None
-
-    if choice == 0:
-        custom = input("Enter path to CSV: ").strip()
-        return Path(custom) if custom else None
-    if 1 <= choice <= len(csv_files):
-        return csv_files[choice - 1]
-
-    print("Selection out of range.", file=sys.stderr)
-    return None
-
-
-def infer_customer_name(df: pd.DataFrame) -> Optional[str]:
-    """Try to infer the customer name from common columns."""
-    candidate_columns = ["Billing Name", "Customer Name", "Customer"]
-    for col in candidate_columns:
-        if col not in df.columns:
-            continue
-        series = df[col].dropna()
-        if series.empty:
-            continue
-        if not pd.api.types.is_string_dtype(series):
-            continue
-        values = series.astype(str).str.strip()
-        values = values[values != ""]
-        uniques = values.unique()
-        if len(uniques) == 1:
-            return uniques[0]
-    return None
+        w(f"   Not dated: Rs {undated_value:,} across {undated_count} entry\n")
+    w("\n")
+    w(f"3) Billing for current calendar year (Jan–Dec {current_year})\n")
+    w(f"   {current_year}: Rs {cy_value:,} across {cy_count} invoice(s)\n")
+    w("\n")
+    w("4) Current outstanding balance\n")
+    w(f"   Rs {outstanding_balance:,}\n")
+    w("\n")
+    w("5) Total number of rented orders\n")
+    w(f"   {order_count}\n")
+
+    return buf.getvalue()
+
+
+def build_report(
+    df: pd.DataFrame, customer: str, as_of: datetime, as_of_str: Optional[str] = None
+) -> str:
+    (
+        fy_totals,
+        fy_counts,
+        min_fy,
+        cy_value,
+        cy_count,
+        undated_value,
+        undated_count,
+        lifetime,
+        balance_total,
+        first_ns,
+    ) = _aggregate(*_column_arrays(df), as_of.year)
+
+    fy_rows = [
+        (int(min_fy) + idx, int(fy_totals[idx]), int(fy_counts[idx]))
+        for idx in range(fy_counts.size)
+        if fy_counts[idx]
+    ]
+    return _render_report(
+        customer,
+        as_of,
+        as_of_str=as_of_str,
+        first_invoice=pd.NaT if first_ns == _DATE_MAX else pd.Timestamp(first_ns),
+        lifetime_billing=int(lifetime),
+        fy_rows=fy_rows,
+        undated_value=int(undated_value),
+        undated_count=int(undated_count),
+        cy_value=int(cy_value),
+        cy_count=int(cy_count),
+        outstanding_balance=int(balance_total),
+        order_count=df["Order No"].nunique(),
+    )
+
+
+def _stream_aggregates(path: Path, current_year: int) -> dict:
+    """Chunked aggregation for CSVs too large to materialize whole.
+
+    Runs the same Numba kernel per chunk and merges the results, so peak
+    memory stays O(chunk size). Returns the _render_report keyword arguments
+    plus the customer name inferred from the first chunk (key "inferred").
+    """
+    wanted = set(BILLING_COLS)
+    fy: dict[int, list] = {}
+    lifetime = balance_total = cy_value = undated_value = 0.0
+    cy_count = undated_count = 0
+    first_ns = _DATE_MAX
+    orders: set = set()
+    inferred: Optional[str] = None
+
+    reader = pd.read_csv(path, chunksize=STREAM_CHUNK_ROWS, usecols=lambda c: c in wanted)
+    for chunk in reader:
+        if inferred is None:
+            inferred = infer_customer_name(chunk)
+        (
+            fy_totals,
+            fy_counts,
+            min_fy,
+            c_cy_value,
+            c_cy_count,
+            c_undated_value,
+            c_undated_count,
+            c_lifetime,
+            c_balance,
+            c_first,
+        ) = _aggregate(*_column_arrays(chunk), current_year)
+
+        for idx in range(fy_counts.size):
+            if fy_counts[idx]:
+                bucket = fy.setdefault(int(min_fy) + idx, [0.0, 0])
+                bucket[0] += float(fy_totals[idx])
+                bucket[1] += int(fy_counts[idx])
+        lifetime += c_lifetime
+        balance_total += c_balance
+        cy_value += c_cy_value
+        cy_count += int(c_cy_count)
+        undated_value += c_undated_value
+        undated_count += int(c_undated_count)
+        if c_first < first_ns:
+            first_ns = c_first
+        orders.update(chunk["Order No"].dropna().unique())
+
+    return {
+        "first_invoice": pd.NaT if first_ns == _DATE_MAX else pd.Timestamp(first_ns),
+        "lifetime_billing": int(lifetime),
+        "fy_rows": [
+            (start_year, int(total), count) for start_year, (total, count) in sorted(fy.items())
+        ],
+        "undated_value": int(undated_value),
+        "undated_count": undated_count,
+        "cy_value": int(cy_value),
+        "cy_count": cy_count,
+        "outstanding_balance": int(balance_total),
+        "order_count": len(orders),
+        "inferred": inferred,
+    }
 
 
 def main() -> None:
@@ -179,29 +361,39 @@ def main() -> None:
         parser.error(f"Input file not found: {input_path}")
 
     as_of = datetime.strptime(args.as_of, "%Y-%m-%d")
-
-    df = pd.read_csv(input_path)
-    required_columns = {"Inv Date", "Inv Value", "Balance", "Order No", "Inv No"}
-    missing = required_columns - set(df.columns)
-    if missing:
-        raise ValueError(f"Input missing required columns: {', '.join(sorted(missing))}")
-
+    as_of_str = as_of.strftime("%d-%b-%Y")
     customer = args.customer
-    if customer == "Customer":
-        inferred = infer_customer_name(df)
-        if inferred:
-            customer = inferred
 
-    report_text = build_report(df, customer, as_of)
+    if input_path.stat().st_size >= LARGE_CSV_BYTES:
+        missing = REQUIRED_COLUMNS - set(csv_header(input_path))
+        if missing:
+            raise ValueError(f"Input missing required columns: {', '.join(sorted(missing))}")
+        aggregates = _stream_aggregates(input_path, as_of.year)
+        inferred = aggregates.pop("inferred")
+        if customer == "Customer" and inferred:
+            customer = inferred
+        report_text = _render_report(customer, as_of, as_of_str=as_of_str, **aggregates)
+    else:
+        df = read_csv_fast(input_path)
+        missing = REQUIRED_COLUMNS - set(df.columns)
+        if missing:
+            raise ValueError(f"Input missing required columns: {', '.join(sorted(missing))}")
+        if customer == "Customer":
+            inferred = infer_customer_name(df)
+            if inferred:
+                customer = inferred
+        report_text = build_report(df, customer, as_of, as_of_str)
 
     output_path = (
         Path(args.output)
         if args.output
         else input_path.with_name(
-            f"Customer Billing Summary - {customer} (as of {as_of:%d-%b-%Y}).txt"
+            f"Customer Billing Summary - {customer} (as of {as_of_str}).txt"
         )
     )
-    output_path.write_text(report_text)
+    # Encode once ourselves: write_text re-encodes through a TextIOWrapper
+    # (and would pick a platform-dependent default encoding).
+    output_path.write_bytes(report_text.encode("utf-8"))
     print(f"Wrote report: {output_path}")
 
 
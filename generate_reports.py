@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 """
-Interactive entrypoint for generating PNZ reports.
+Entrypoint for generating PNZ reports.
 
-Provides two flows:
+Provides three flows:
   1) Customer Billing Summary (full billing view)
   2) Outstanding Balance Summary (balance-only view)
+  3) Both reports from a single parse of the input
+
+Runs interactively when invoked from a terminal; every prompt can also be
+answered up front with flags (--mode, --input, --customer, --as-of, --output)
+so batch runs never block on stdin.
 
 Supports CSV, XLS, XLSX, and ODS inputs (pandas must have the right extras installed
 for Excel/ODS engines).
@@ -12,26 +17,27 @@ for Excel/ODS engines).
 
 from __future__ import annotations
 
+import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Optional
 
 import pandas as pd
 
-from balance_sum_report import build_balance_report, infer_customer_name as infer_balance_name
+from balance_sum_report import build_balance_report
 from generate_billing_report import build_report as build_billing_report
-from generate_billing_report import infer_customer_name as infer_billing_name
-
-
-SUPPORTED_SUFFIXES = {".csv", ".xls", ".xlsx", ".ods"}
-
-
-def list_candidate_files(folder: Path) -> list[Path]:
-    """Return candidate input files in folder, newest first."""
-    files: Iterable[Path] = folder.glob("*")
-    candidates = [p for p in files if p.suffix.lower() in SUPPORTED_SUFFIXES and p.is_file()]
-    return sorted(candidates, key=lambda p: p.stat().st_mtime, reverse=True)
+from pnz_common import (
+    BALANCE_COLS,
+    BILLING_COLS,
+    cached_read_csv,
+    infer_customer_name,
+    list_candidate_files,
+    prompt_as_of,
+    prompt_customer,
+    to_dataframe,
+)
 
 
 def prompt_file(folder: Path) -> Optional[Path]:
@@ -41,9 +47,9 @@ def prompt_file(folder: Path) -> Optional[Path]:
         return None
 
     print("Select an input file:")
-    for idx, path in enumerate(files, start=1):
-        mtime = datetime.fromtimestamp(path.stat().st_mtime).strftime("%Y-%m-%d %H:%M")
-        print(f"  {idx}) {path.name} (modified {mtime})")
+    for idx, (path, mtime) in enumerate(files, start=1):
+        mtime_str = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M")
+        print(f"  {idx}) {path.name} (modified {mtime_str})")
     print("  0) Enter a custom path")
 
     try:
@@ -61,82 +67,181 @@ def prompt_file(folder: Path) -> Optional[Path]:
         custom = input("Enter path: ").strip()
         return Path(custom) if custom else None
     if 1 <= choice <= len(files):
-        return files[choice - 1]
+        return files[choice - 1][0]
 
     print("Selection out of range.", file=sys.stderr)
     return None
 
 
-def load_table(path: Path) -> pd.DataFrame:
+def load_table(path: Path, columns: Optional[list[str]] = None) -> pd.DataFrame:
     suffix = path.suffix.lower()
     if suffix == ".csv":
-        return pd.read_csv(path)
+        return to_dataframe(cached_read_csv(path, columns))
     # Let pandas pick the right engine for Excel/ODS
+    if columns is not None:
+        wanted = set(columns)
+        return pd.read_excel(path, usecols=lambda c: c in wanted)
     return pd.read_excel(path)
 
 
-def prompt_customer(inferred: Optional[str]) -> str:
-    default_label = inferred or "Customer"
-    entered = input(f"Customer name [{default_label}]: ").strip()
-    return entered or default_label
-
-
-def prompt_as_of() -> datetime:
-    today_str = datetime.today().strftime("%Y-%m-%d")
-    entered = input(f"As-of date (YYYY-MM-DD) [{today_str}]: ").strip()
-    use_str = entered or today_str
-    try:
-        return datetime.strptime(use_str, "%Y-%m-%d")
-    except ValueError:
-        print("Invalid date format, using today instead.", file=sys.stderr)
-        return datetime.today()
-
-
-def run_billing_summary(input_path: Path) -> None:
-    df = load_table(input_path)
+def _resolve_customer_as_of(
+    df: pd.DataFrame,
+    customer: Optional[str],
+    as_of: Optional[datetime],
+    interactive: bool,
+) -> tuple[str, datetime]:
+    """Fill in customer/as-of from flags, prompts, or defaults (batch mode)."""
+    if customer is None:
+        inferred = infer_customer_name(df)
+        customer = prompt_customer(inferred) if interactive else (inferred or "Customer")
+    if as_of is None:
+        as_of = prompt_as_of() if interactive else datetime.today()
+    return customer, as_of
+
+
+def run_billing_summary(
+    input_path: Path,
+    customer: Optional[str] = None,
+    as_of: Optional[datetime] = None,
+    output: Optional[str] = None,
+    interactive: bool = True,
+) -> None:
+    df = load_table(input_path, BILLING_COLS)
     missing = {"Inv Date", "Inv Value", "Balance", "Order No", "Inv No"} - set(df.columns)
     if missing:
         raise ValueError(f"Input missing required columns: {', '.join(sorted(missing))}")
 
-    inferred = infer_billing_name(df)
-    customer = prompt_customer(inferred)
-    as_of = prompt_as_of()
+    customer, as_of = _resolve_customer_as_of(df, customer, as_of, interactive)
+    as_of_str = as_of.strftime("%d-%b-%Y")
 
-    report_text = build_billing_report(df, customer, as_of)
-    output_path = input_path.with_name(f"Customer Billing Summary - {customer} (as of {as_of:%d-%b-%Y}).txt")
-    output_path.write_text(report_text)
+    report_text = build_billing_report(df, customer, as_of, as_of_str)
+    output_path = (
+        Path(output)
+        if output
+        else input_path.with_name(f"Customer Billing Summary - {customer} (as of {as_of_str}).txt")
+    )
+    output_path.write_bytes(report_text.encode("utf-8"))
     print(f"Wrote billing summary: {output_path}")
 
 
-def run_balance_summary(input_path: Path) -> None:
-    df = load_table(input_path)
+def run_balance_summary(
+    input_path: Path,
+    customer: Optional[str] = None,
+    as_of: Optional[datetime] = None,
+    output: Optional[str] = None,
+    interactive: bool = True,
+) -> None:
+    df = load_table(input_path, BALANCE_COLS)
     if "Balance" not in df.columns:
         raise ValueError("Input missing required column: Balance")
 
-    inferred = infer_balance_name(df)
-    customer = prompt_customer(inferred)
-    as_of = prompt_as_of()
+    customer, as_of = _resolve_customer_as_of(df, customer, as_of, interactive)
+    as_of_str = as_of.strftime("%d-%b-%Y")
 
-    report_text = build_balance_report(df, customer, as_of)
-    output_path = input_path.with_name(f"Balance Summary - {customer} (as of {as_of:%d-%b-%Y}).txt")
-    output_path.write_text(report_text)
+    report_text = build_balance_report(df, customer, as_of, as_of_str)
+    output_path = (
+        Path(output)
+        if output
+        else input_path.with_name(f"Balance Summary - {customer} (as of {as_of_str}).txt")
+    )
+    output_path.write_bytes(report_text.encode("utf-8"))
     print(f"Wrote balance summary: {output_path}")
 
 
-def main() -> None:
+def run_both(
+    input_path: Path,
+    customer: Optional[str] = None,
+    as_of: Optional[datetime] = None,
+    interactive: bool = True,
+) -> None:
+    """Generate both reports from a single parse of the input.
+
+    The input is loaded once (the billing column set covers the balance one)
+    and the two builders run on separate threads: their heavy reductions are
+    Arrow and NumPy kernels that release the GIL, so the reports overlap
+    instead of running back to back.
+    """
+    df = load_table(input_path, BILLING_COLS)
+    missing = {"Inv Date", "Inv Value", "Balance", "Order No", "Inv No"} - set(df.columns)
+    if missing:
+        raise ValueError(f"Input missing required columns: {', '.join(sorted(missing))}")
+
+    customer, as_of = _resolve_customer_as_of(df, customer, as_of, interactive)
+    as_of_str = as_of.strftime("%d-%b-%Y")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        billing = pool.submit(build_billing_report, df, customer, as_of, as_of_str)
+        balance = pool.submit(build_balance_report, df, customer, as_of, as_of_str)
+        billing_text = billing.result()
+        balance_text = balance.result()
+
+    billing_path = input_path.with_name(
+        f"Customer Billing Summary - {customer} (as of {as_of_str}).txt"
+    )
+    balance_path = input_path.with_name(f"Balance Summary - {customer} (as of {as_of_str}).txt")
+    billing_path.write_bytes(billing_text.encode("utf-8"))
+    balance_path.write_bytes(balance_text.encode("utf-8"))
+    print(f"Wrote billing summary: {billing_path}")
+    print(f"Wrote balance summary: {balance_path}")
+
+
+def prompt_mode() -> Optional[str]:
     print("What would you like to generate?")
     print("  1) Customer Billing Summary (lifetime, FY/CY breakdown, outstanding, orders)")
     print("  2) Outstanding Balance Summary (balance-only view)")
+    print("  3) Both reports")
     try:
-        choice_raw = input("Enter choice (1/2): ").strip()
+        choice_raw = input("Enter choice (1/2/3): ").strip()
     except EOFError:
-        return
+        return None
 
-    if choice_raw not in {"1", "2"}:
-        print("Invalid choice. Exiting.", file=sys.stderr)
-        return
+    if choice_raw == "1":
+        return "billing"
+    if choice_raw == "2":
+        return "balance"
+    if choice_raw == "3":
+        return "both"
+    print("Invalid choice. Exiting.", file=sys.stderr)
+    return None
 
-    input_path = prompt_file(Path("."))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate PNZ customer reports.")
+    parser.add_argument(
+        "--mode",
+        choices=("billing", "balance", "both"),
+        help="Report to generate; prompted for interactively when omitted.",
+    )
+    parser.add_argument("--input", help="Path to the input file (CSV/XLS/XLSX/ODS).")
+    parser.add_argument(
+        "--customer",
+        help="Customer name for the header (default: inferred from the input, or prompted).",
+    )
+    parser.add_argument(
+        "--as-of",
+        help="As-of date in YYYY-MM-DD format (default: today, or prompted).",
+    )
+    parser.add_argument("--output", help="Optional output path.")
+    args = parser.parse_args()
+
+    # Only prompt when attached to a terminal; in pipelines, missing flags are
+    # an immediate error instead of a silent wait on stdin.
+    interactive = sys.stdin.isatty()
+
+    mode = args.mode
+    if mode is None:
+        if not interactive:
+            parser.error("--mode is required when stdin is not a terminal.")
+        mode = prompt_mode()
+        if mode is None:
+            return
+
+    if args.input:
+        input_path: Optional[Path] = Path(args.input)
+    elif interactive:
+        input_path = prompt_file(Path("."))
+    else:
+        parser.error("--input is required when stdin is not a terminal.")
     if not input_path:
         print("No input file selected. Exiting.", file=sys.stderr)
         return
@@ -144,11 +249,16 @@ def main() -> None:
         print(f"Input file not found: {input_path}", file=sys.stderr)
         return
 
+    as_of = datetime.strptime(args.as_of, "%Y-%m-%d") if args.as_of else None
+
     try:
-        if choice_raw == "1":
-            run_billing_summary(input_path)
+        if mode == "both":
+            if args.output:
+                parser.error("--output is ambiguous with --mode both; the default names are used.")
+            run_both(input_path, args.customer, as_of, interactive)
         else:
-            run_balance_summary(input_path)
+            run = run_billing_summary if mode == "billing" else run_balance_summary
+            run(input_path, args.customer, as_of, args.output, interactive)
     except Exception as exc:
         print(f"Error: {exc}", file=sys.stderr)
         sys.exit(1)